@@ -4,11 +4,18 @@ Auto Delete Old Telegram Messages (No User Input Required)
 Deletes all messages except those sent in the last 24 hours.
 """
 import asyncio
-from datetime import datetime, timedelta
-from json_analyzer import TelegramJSONAnalyzer
+import logging
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from json_analyzer import TelegramJSONAnalyzer, compile_keyword_pattern
 from telegram_deleter import TelegramDeleter
 from config import Config
 
+# Per-batch deletion progress goes through the handlers TelegramDeleter sets up
+log = logging.getLogger(__name__)
+
 # ========================================
 # CONFIGURATION - EDIT THESE VALUES
 # ========================================
@@ -31,6 +38,33 @@ KEYWORDS = [
 CASE_SENSITIVE = False  # Set to True for case sensitive search
 WHOLE_WORDS = True      # Set to False to allow partial matches
 
+@lru_cache(maxsize=64)
+def _whole_word_pattern(keywords: tuple, case_sensitive: bool):
+    """Return the compiled whole-word alternation for literal keywords."""
+    alternation = '|'.join(re.escape(keyword) for keyword in keywords)
+    return re.compile(rf'\b(?:{alternation})\b', 0 if case_sensitive else re.IGNORECASE)
+
+def _build_matcher(keywords: list, case_sensitive: bool, whole_words: bool):
+    """Return a function that tests whether a message text contains any keyword."""
+    # Plain substring probes reject most messages before any regex runs
+    keyword_literals = tuple(keyword if case_sensitive else keyword.lower() for keyword in keywords)
+    
+    if not whole_words:
+        def matches(text):
+            probe_text = text if case_sensitive else text.lower()
+            return any(literal in probe_text for literal in keyword_literals)
+        return matches
+    
+    # Whole-word matches are confirmed with one compiled alternation
+    keyword_pattern = _whole_word_pattern(tuple(keywords), case_sensitive)
+    
+    def matches(text):
+        probe_text = text if case_sensitive else text.lower()
+        if not any(literal in probe_text for literal in keyword_literals):
+            return False
+        return keyword_pattern.search(text) is not None
+    return matches
+
 async def api_only_delete_messages(hours_to_keep: int = 24, keywords: list = None, case_sensitive: bool = False, whole_words: bool = True):
     """Delete messages using API-only mode (no export file needed)."""
     
@@ -46,6 +80,9 @@ async def api_only_delete_messages(hours_to_keep: int = 24, keywords: list = Non
     print(f"⚙️  Whole words only: {whole_words}")
     print()
     
+    # Without keywords every old message matches, so skip the matcher entirely
+    matches_keywords = (lambda text: True) if not keywords else _build_matcher(keywords, case_sensitive, whole_words)
+    
     try:
         # Validate configuration
         Config.validate()
@@ -68,118 +105,124 @@ async def api_only_delete_messages(hours_to_keep: int = 24, keywords: list = Non
         try:
             # Get all dialogs (chats)
             print("📂 Loading your chats...")
-            dialogs = await deleter.client.get_dialogs()
+            dialogs = await deleter.get_dialogs()
             print(f"📊 Found {len(dialogs)} chats")
             
             # Calculate cutoff time
-            from datetime import datetime, timedelta
-            cutoff_time = datetime.now() - timedelta(hours=hours_to_keep)
-            print(f"⏰ Cutoff time: {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            # Telethon message dates are timezone-aware UTC
+            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_to_keep)
+            print(f"⏰ Cutoff time: {cutoff_time.astimezone().strftime('%Y-%m-%d %H:%M:%S')}")
             
-            messages_to_delete = []
-            total_processed = 0
+            # Search chats concurrently; the semaphore keeps the number of
+            # in-flight requests within Telegram's flood limits
+            semaphore = asyncio.Semaphore(Config.SCAN_CONCURRENCY)
+            chat_names = {dialog: dialog.name or f"Chat_{dialog.id}" for dialog in dialogs}
             
-            # Search through each chat
-            for dialog in dialogs:
-                chat_name = dialog.name or f"Chat_{dialog.id}"
-                print(f"🔍 Searching {chat_name}...")
+            async def scan_dialog(dialog):
+                """Return (message IDs to delete, messages processed) for one chat."""
+                chat_name = chat_names[dialog]
+                message_ids = []
+                processed = 0
                 
-                try:
-                    # Get messages from this chat
-                    messages = await deleter.client.get_messages(dialog, limit=None)
+                async with semaphore:
+                    print(f"🔍 Searching {chat_name}...")
                     
-                    for message in messages:
-                        total_processed += 1
-                        
-                        # Check if message is from us
-                        if not message.out:
-                            continue
-                        
-                        # Check if message is old enough
-                        if message.date < cutoff_time:
+                    try:
+                        # Only page through our own history older than the cutoff;
+                        # Telegram applies both filters server-side
+                        async for message in deleter.client.iter_messages(
+                            dialog, from_user='me', offset_date=cutoff_time
+                        ):
+                            processed += 1
+                            
+                            message_text = message.text or ""
+                            
                             # Check keywords if specified
-                            if keywords and len(keywords) > 0:
-                                message_text = str(message.text or "").lower()
-                                keyword_found = False
-                                
-                                for keyword in keywords:
-                                    search_keyword = keyword.lower() if not case_sensitive else keyword
-                                    
-                                    if whole_words:
-                                        # Whole word matching
-                                        import re
-                                        pattern = rf'\b{re.escape(search_keyword)}\b'
-                                        if re.search(pattern, message_text, re.IGNORECASE if not case_sensitive else 0):
-                                            keyword_found = True
-                                            break
-                                    else:
-                                        # Partial matching
-                                        if search_keyword in message_text:
-                                            keyword_found = True
-                                            break
-                                
-                                if not keyword_found:
-                                    continue
+                            if not matches_keywords(message_text):
+                                continue
                             
                             # Add to deletion list
-                            messages_to_delete.append({
-                                'chat_entity': dialog,
-                                'message_id': message.id,
-                                'chat_name': chat_name,
-                                'date': message.date,
-                                'text': str(message.text or "")[:50] + "..." if len(str(message.text or "")) > 50 else str(message.text or "")
-                            })
+                            message_ids.append(message.id)
+                    
+                    except Exception as e:
+                        print(f"⚠️  Error processing {chat_name}: {e}")
                 
-                except Exception as e:
-                    print(f"⚠️  Error processing {chat_name}: {e}")
-                    continue
+                return message_ids, processed
+            
+            # Message IDs to delete, keyed by chat, ready for bulk deletion
+            results = await asyncio.gather(*(scan_dialog(dialog) for dialog in dialogs))
+            pending = {dialog: message_ids for dialog, (message_ids, _) in zip(dialogs, results) if message_ids}
+            total_processed = sum(processed for _, processed in results)
+            total_to_delete = sum(len(message_ids) for message_ids in pending.values())
             
             print(f"\n📊 Search complete!")
             print(f"📊 Total messages processed: {total_processed}")
-            print(f"🗑️  Messages to delete: {len(messages_to_delete)}")
+            print(f"🗑️  Messages to delete: {total_to_delete}")
             
-            if not messages_to_delete:
+            if not pending:
                 print("✅ No messages found to delete.")
                 return
             
             # Show summary by chat
-            chat_counts = {}
-            for msg in messages_to_delete:
-                chat_name = msg['chat_name']
-                chat_counts[chat_name] = chat_counts.get(chat_name, 0) + 1
+            chat_counts = Counter()
+            for dialog, message_ids in pending.items():
+                chat_counts[chat_names[dialog]] += len(message_ids)
             
             print(f"\n📋 Messages to delete by chat:")
-            for chat, count in sorted(chat_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
+            for chat, count in chat_counts.most_common(10):
                 print(f"  - {chat}: {count} messages")
             if len(chat_counts) > 10:
                 print(f"  ... and {len(chat_counts) - 10} more chats")
             
             # Delete messages
-            print(f"\n🗑️  Starting deletion of {len(messages_to_delete)} messages...")
+            print(f"\n🗑️  Starting deletion of {total_to_delete} messages...")
             
             deleted_count = 0
             failed_count = 0
+            delete_semaphore = asyncio.Semaphore(Config.DELETE_CONCURRENCY)
             
-            for msg in messages_to_delete:
-                try:
-                    success, error_msg = await deleter.delete_message(
-                        msg['chat_entity'], 
-                        msg['message_id'], 
-                        revoke=True, 
+            async def delete_chunk(chat_entity, message_ids):
+                nonlocal deleted_count, failed_count
+                chat_name = chat_names[chat_entity]
+                
+                # delete_messages_bulk reports failures in its return value
+                # instead of raising, so no per-chunk try/except is needed
+                async with delete_semaphore:
+                    success, error_msg = await deleter.delete_messages_bulk(
+                        chat_entity,
+                        message_ids,
+                        revoke=True,
                         dry_run=False
                     )
                     
                     if success:
-                        deleted_count += 1
-                        if deleted_count % 100 == 0:
-                            print(f"✅ Deleted {deleted_count}/{len(messages_to_delete)} messages...")
+                        deleted_count += len(message_ids)
+                        log.info("Deleted %d/%d messages", deleted_count, total_to_delete)
+                    elif len(message_ids) > 1:
+                        # One bad message fails the whole request, so retry the
+                        # chunk one ID at a time to delete the rest
+                        log.warning("Bulk delete failed in %s (%s), retrying individually", chat_name, error_msg)
+                        for message_id in message_ids:
+                            success, error_msg = await deleter.delete_messages_bulk(
+                                chat_entity,
+                                [message_id],
+                                revoke=True,
+                                dry_run=False
+                            )
+                            if success:
+                                deleted_count += 1
+                            else:
+                                failed_count += 1
+                                log.warning("Failed to delete message %s in %s: %s", message_id, chat_name, error_msg)
                     else:
                         failed_count += 1
-                        print(f"❌ Failed to delete message in {msg['chat_name']}: {error_msg}")
-                
-                except Exception as e:
-                    failed_count += 1
-                    print(f"❌ Error deleting message in {msg['chat_name']}: {e}")
+                        log.warning("Failed to delete message %s in %s: %s", message_ids[0], chat_name, error_msg)
+            
+            await asyncio.gather(*(
+                delete_chunk(chat_entity, message_ids[i:i + Config.BATCH_SIZE])
+                for chat_entity, message_ids in pending.items()
+                for i in range(0, len(message_ids), Config.BATCH_SIZE)
+            ))
             
             # Print final results
             print(f"\n" + "="*50)
@@ -187,7 +230,7 @@ async def api_only_delete_messages(hours_to_keep: int = 24, keywords: list = Non
             print(f"="*50)
             print(f"Successfully deleted: {deleted_count}")
             print(f"Failed: {failed_count}")
-            print(f"Total processed: {len(messages_to_delete)}")
+            print(f"Total processed: {total_to_delete}")
             
         finally:
             await deleter.disconnect()
@@ -226,25 +269,26 @@ async def auto_delete_old_messages(export_file: str, hours_to_keep: int = 24, ke
         analyzer.extract_outgoing_messages()
         
         # Calculate cutoff time
-        cutoff_time = datetime.now() - timedelta(hours=hours_to_keep)
-        print(f"⏰ Cutoff time: {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_to_keep)
+        print(f"⏰ Cutoff time: {cutoff_time.astimezone().strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # extract_outgoing_messages stores dates as naive UTC (ISO-only dates
+        # are converted from local time), so compare against one UTC cutoff
+        cutoff_utc = cutoff_time.replace(tzinfo=None)
         
         # Filter messages older than cutoff
         all_messages = analyzer.messages_df
-        old_messages = all_messages[all_messages['date'] < cutoff_time]
-        recent_messages = all_messages[all_messages['date'] >= cutoff_time]
+        is_old = all_messages['date'] < cutoff_utc
+        old_messages = all_messages[is_old]
+        recent_messages = all_messages[all_messages['date'] >= cutoff_utc]
         
         # Apply keyword filter if specified
         if keywords and len(keywords) > 0:
             print(f"🔍 Filtering old messages by keywords: {', '.join(keywords)}")
-            # Use the analyzer's keyword search function
-            keyword_matches = analyzer.find_messages_by_keywords(
-                keywords, 
-                case_sensitive=case_sensitive,
-                whole_words=whole_words
-            )
-            # Only keep old messages that match keywords
-            old_messages = old_messages[old_messages['message_id'].isin(keyword_matches['message_id'])]
+            # Same pattern as the analyzer's keyword search, applied as a column mask
+            pattern = compile_keyword_pattern(keywords, case_sensitive, whole_words)
+            keyword_mask = all_messages['text'].fillna('').astype(str).str.contains(pattern)
+            old_messages = all_messages[is_old & keyword_mask]
             print(f"📊 After keyword filtering: {len(old_messages)} messages to delete")
         else:
             print("🔍 No keyword filter - will delete ALL old messages")
@@ -269,8 +313,7 @@ async def auto_delete_old_messages(export_file: str, hours_to_keep: int = 24, ke
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         csv_file = f"output/old_messages_to_delete_{timestamp}.csv"
         preview_columns = ['chat_name', 'chat_type', 'message_id', 'date', 'text']
-        preview_df = old_messages[preview_columns].copy()
-        preview_df.to_csv(csv_file, index=False, encoding='utf-8')
+        old_messages[preview_columns].to_csv(csv_file, index=False, encoding='utf-8', chunksize=50_000)
         print(f"📄 Preview saved to: {csv_file}")
         
         print(f"\n🚀 Starting deletion of {len(old_messages)} old messages...")
@@ -303,7 +346,7 @@ async def auto_delete_old_messages(export_file: str, hours_to_keep: int = 24, ke
             deleter.print_statistics()
             
             # Save error report if there were errors
-            if stats.get('errors'):
+            if stats['errors']['message_id']:
                 deleter.save_error_report()
                 print(f"\n📄 Error report saved - check for any failed deletions")
             
@@ -22,6 +22,7 @@ class Config:
     # Deletion settings
     BATCH_SIZE = 100  # Number of messages to delete in each batch
     DELAY_BETWEEN_BATCHES = 2  # Seconds to wait between batches
+    DELETE_CONCURRENCY = 4  # Batches deleted in parallel in API-only mode
     DRY_RUN = True  # Set to False to actually delete messages
     
     # Search settings
@@ -29,6 +30,7 @@ class Config:
         # Add your keywords here as regex patterns
         # Example: r'\bpassword\b', r'\btoken\b', r'\bsecret\b'
     ]
+    SCAN_CONCURRENCY = 8  # Chats searched in parallel in API-only mode
     
     # Chat filtering (optional)
     INCLUDE_CHAT_TYPES = ['private', 'group', 'supergroup', 'channel']
@@ -3,37 +3,221 @@ JSON Analyzer for Telegram Export Data
 Analyzes exported Telegram JSON data to find messages containing specified keywords.
 """
 import json
+import mmap
 import re
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import os
 from pathlib import Path
 
+try:
+    import orjson  # Optional: much faster parsing of large exports
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # Optional: stream chats instead of loading the whole export
+except ImportError:
+    ijson = None
+
+try:
+    import pyarrow  # Optional: compact Arrow-backed string columns
+except ImportError:
+    pyarrow = None
+
+try:
+    import ahocorasick  # Optional: one-pass prefilter for many literal keywords
+except ImportError:
+    ahocorasick = None
+
+# Characters that make a keyword a regex rather than a plain literal
+_REGEX_METACHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+@lru_cache(maxsize=64)
+def _compile_keyword_set(keywords: Tuple[str, ...], case_sensitive: bool,
+                         whole_words: bool) -> Tuple[re.Pattern, re.Pattern]:
+    """
+    Compile a keyword set once per combination of search options.
+    
+    Args:
+        keywords: Tuple of regex patterns to search for
+        case_sensitive: Whether search should be case sensitive
+        whole_words: Whether to match whole words only
+    
+    Returns:
+        Tuple of (pattern matching any keyword, pattern with a named group
+        kN for keyword N)
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    # Add word boundaries for whole word matching
+    boundary = r'\b' if whole_words else ''
+    
+    combined = re.compile(f'{boundary}(?:{"|".join(keywords)}){boundary}', flags)
+    labeled = re.compile('|'.join(f'(?P<k{i}>{boundary}(?:{kw}){boundary})' for i, kw in enumerate(keywords)), flags)
+    return combined, labeled
+
+
+def compile_keyword_pattern(keywords: List[str], case_sensitive: bool = False,
+                            whole_words: bool = True) -> re.Pattern:
+    """
+    Compile keywords into a single regex alternation.
+    
+    Args:
+        keywords: List of regex patterns to search for
+        case_sensitive: Whether search should be case sensitive
+        whole_words: Whether to match whole words only
+    
+    Returns:
+        Compiled pattern matching any of the keywords
+    """
+    return _compile_keyword_set(tuple(keywords), case_sensitive, whole_words)[0]
+
+
+def _literal_prefilter(texts: pd.Series, keywords: List[str],
+                       case_sensitive: bool) -> Optional[pd.Series]:
+    """
+    Mark texts containing any keyword as a plain substring.
+    
+    A single Aho-Corasick automaton scans each text once regardless of the
+    number of keywords. Only rows it marks can match the keyword regex.
+    
+    str.lower() and re.IGNORECASE only agree on ASCII (e.g. 'İ', 'ſ' and the
+    Greek final sigma differ), so for case-insensitive searches the
+    keywords must be ASCII and every non-ASCII text is kept as a candidate.
+    
+    Args:
+        texts: Message texts
+        keywords: List of keywords to search for
+        case_sensitive: Whether search should be case sensitive
+    
+    Returns:
+        Boolean mask of candidate rows, or None if pyahocorasick is not
+        installed, a keyword uses regex syntax, or a case-insensitive
+        keyword is not ASCII
+    """
+    if ahocorasick is None or any(not kw or _REGEX_METACHARS.intersection(kw) for kw in keywords):
+        return None
+    if not case_sensitive and not all(kw.isascii() for kw in keywords):
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for kw in keywords:
+        automaton.add_word(kw if case_sensitive else kw.lower(), kw)
+    automaton.make_automaton()
+    
+    if case_sensitive:
+        candidates = [next(automaton.iter(text), None) is not None for text in texts.to_numpy()]
+    else:
+        candidates = [
+            not text.isascii() or next(automaton.iter(text.lower()), None) is not None
+            for text in texts.to_numpy()
+        ]
+    return pd.Series(candidates, index=texts.index, dtype=bool)
+
+
+def _local_timestamp(date: str) -> float:
+    """Convert an export's ISO date, in local wall-clock time, to a Unix timestamp."""
+    return datetime.fromisoformat(date).timestamp()
+
+
+def _coerce_text(text: Any) -> str:
+    """Flatten a message's text field, which may be a list of text entities."""
+    if type(text) is not list:
+        return text
+    # Join the text of entity dicts; exact type checks skip isinstance's MRO walk
+    return ' '.join(item['text'] for item in text if type(item) is dict and 'text' in item)
+
+
 class TelegramJSONAnalyzer:
-    def __init__(self, export_file: str):
+    # Messages normalized per DataFrame batch while extracting messages
+    MESSAGE_BATCH_SIZE = 50_000
+    
+    def __init__(self, export_file: str, stream: bool = False):
         """
         Initialize the analyzer with a Telegram JSON export file.
         
         Args:
             export_file: Path to the JSON export file
+            stream: Stream chats from the file with ijson instead of loading
+                the whole export into memory (requires ijson)
         """
         self.export_file = Path(export_file)
         self.data = None
         self.messages_df = None
         
+        if stream and ijson is None:
+            print("⚠️  Warning: ijson is not installed. Loading the whole export instead of streaming.")
+        self.stream = stream and ijson is not None
+        
     def load_export(self) -> Dict[str, Any]:
         """Load the JSON export data."""
         if not self.export_file.exists():
             raise FileNotFoundError(f"Export file not found: {self.export_file}")
         
         print(f"Loading Telegram export from: {self.export_file}")
-        with open(self.export_file, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
+        if self.stream:
+            # Only the personal details are read now; extract_outgoing_messages
+            # streams the chats one at a time
+            with open(self.export_file, 'rb') as f:
+                self.data = {'personal_information': next(ijson.items(f, 'personal_information'), {})}
+            print("Streaming chats from export")
+            return self.data
+        
+        if orjson is not None:
+            # Parse straight from a memory map instead of copying the file into bytes
+            with open(self.export_file, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                    memoryview(mapped) as buffer:
+                self.data = orjson.loads(buffer)
+        else:
+            with open(self.export_file, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
         
         print(f"Loaded {len(self.data.get('chats', {}).get('list', []))} chats")
         return self.data
     
+    def _iter_chats(self) -> Iterator[Dict[str, Any]]:
+        """Yield chats from the loaded data, or from the file when streaming."""
+        if not self.stream:
+            yield from self.data.get('chats', {}).get('list', [])
+            return
+        
+        with open(self.export_file, 'rb') as f:
+            yield from ijson.items(f, 'chats.list.item')
+    
+    def _iter_chat_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Group chats into batches of about MESSAGE_BATCH_SIZE messages.
+        
+        Batches are sized by message count rather than chat count, so when
+        streaming only one batch of parsed messages is held at a time. A
+        single chat larger than the limit forms a batch of its own.
+        """
+        batch = []
+        batch_messages = 0
+        for chat in self._iter_chats():
+            batch.append(chat)
+            batch_messages += len(chat.get('messages', []))
+            if batch_messages >= self.MESSAGE_BATCH_SIZE:
+                yield batch
+                batch = []
+                batch_messages = 0
+        if batch:
+            yield batch
+    
+    def _iter_messages(self) -> Iterator[Dict[str, Any]]:
+        """Yield every message of every chat."""
+        if not self.stream:
+            for chat in self.data.get('chats', {}).get('list', []):
+                yield from chat.get('messages', [])
+            return
+        
+        with open(self.export_file, 'rb') as f:
+            yield from ijson.items(f, 'chats.list.item.messages.item')
+    
     def extract_outgoing_messages(self) -> pd.DataFrame:
         """
         Extract all outgoing messages from the JSON export.
@@ -47,82 +231,107 @@ class TelegramJSONAnalyzer:
         if not user_id:
             # Try to extract from first message if personal_information not available
             user_id = None
-            for chat in self.data.get('chats', {}).get('list', []):
-                for message in chat.get('messages', []):
-                    if message.get('from_id', '').startswith('user'):
-                        user_id = message.get('from_id')
-                        break
-                if user_id:
+            for message in self._iter_messages():
+                if message.get('from_id', '').startswith('user'):
+                    user_id = message.get('from_id')
                     break
         
         if not user_id:
             print("⚠️  Warning: Could not determine user ID. Will try to detect outgoing messages by other means.")
         
-        messages = []
-        chats = self.data.get('chats', {}).get('list', [])
+        first_name = self.data.get('personal_information', {}).get('first_name', '')
         
-        for chat in chats:
-            chat_id = chat.get('id')
-            chat_name = chat.get('name', f"Chat_{chat_id}")
-            chat_type = chat.get('type', 'unknown')
-            
-            # Process messages in this chat
-            for message in chat.get('messages', []):
-                # Check if this is an outgoing message
-                is_outgoing = False
-                
-                # Method 1: Check for 'out' field (older format)
-                if message.get('out', False):
-                    is_outgoing = True
-                
-                # Method 2: Check if from_id matches user ID (newer format)
-                elif user_id and message.get('from_id') == f"user{user_id}":
-                    is_outgoing = True
-                
-                # Method 3: Check if from_id starts with 'user' and matches user ID
-                elif user_id and message.get('from_id') == str(user_id):
-                    is_outgoing = True
-                
-                # Method 4: Check if from field matches the user's name
-                elif message.get('from') and message.get('from') == self.data.get('personal_information', {}).get('first_name', ''):
-                    is_outgoing = True
-                
-                if is_outgoing:
-                    # Handle text field which can be string or list
-                    text_content = message.get('text', '')
-                    if isinstance(text_content, list):
-                        # Extract text from text entities
-                        text_content = ' '.join([item.get('text', '') for item in text_content if isinstance(item, dict) and 'text' in item])
-                    
-                    msg_data = {
-                        'chat_id': chat_id,
-                        'chat_name': chat_name,
-                        'chat_type': chat_type,
-                        'message_id': message.get('id'),
-                        'date': message.get('date_unixtime', message.get('date')),
-                        'text': text_content,
-                        'from_id': message.get('from_id'),
-                        'from': message.get('from'),
-                        'reply_to_message_id': message.get('reply_to_message_id'),
-                    }
-                    messages.append(msg_data)
-        
-        self.messages_df = pd.DataFrame(messages)
-        
-        # Convert date to datetime
-        if not self.messages_df.empty:
-            # Handle both unix timestamp and ISO date formats
-            if self.messages_df['date'].dtype == 'object':
-                # Try to convert unix timestamp first
-                try:
-                    self.messages_df['date'] = pd.to_datetime(self.messages_df['date'], unit='s')
-                except:
-                    # If that fails, try regular datetime parsing
-                    self.messages_df['date'] = pd.to_datetime(self.messages_df['date'])
+        # Normalize chats in batches so only one batch of raw messages is
+        # flattened at a time; when streaming, only that batch is in memory
+        frames = [
+            self._outgoing_frame(batch, user_id, first_name)
+            for batch in self._iter_chat_batches()
+        ]
+        
+        if frames:
+            self.messages_df = pd.concat(frames, ignore_index=True)
+        else:
+            self.messages_df = self._outgoing_frame([], user_id, first_name)
+        
+        # Arrow strings take far less memory than per-cell Python objects.
+        # Keyword searches still convert text back to str and use Python's re
+        if pyarrow is not None:
+            string_columns = ['chat_name', 'chat_type', 'text', 'from_id', 'from']
+            self.messages_df[string_columns] = self.messages_df[string_columns].astype('string[pyarrow]')
         
         print(f"Extracted {len(self.messages_df)} outgoing messages")
         return self.messages_df
     
+    def _outgoing_frame(self, chats: List[Dict[str, Any]], user_id: Any,
+                        first_name: str) -> pd.DataFrame:
+        """
+        Build the outgoing-message DataFrame for a list of chats.
+        
+        Args:
+            chats: Chats from the export's chats list
+            user_id: The user's ID, if known
+            first_name: The user's first name, if known
+        
+        Returns:
+            DataFrame with one row per outgoing message
+        """
+        # Flatten every chat's messages into one frame, tagging each row with
+        # its chat's id, name and type (chats without messages have no records)
+        chats = [chat for chat in chats if chat.get('messages')]
+        if chats:
+            df = pd.json_normalize(chats, record_path='messages', meta=['id', 'name', 'type'],
+                                   meta_prefix='chat_', errors='ignore', max_level=0)
+        else:
+            df = pd.DataFrame(columns=['chat_id', 'chat_name', 'chat_type'])
+        
+        def column(name: str) -> pd.Series:
+            """Return a message field, or an empty column if no message has it."""
+            return df[name] if name in df else pd.Series(None, index=df.index, dtype=object)
+        
+        from_id = column('from_id')
+        sender = column('from')
+        
+        # Outgoing if marked 'out' (older format), if from_id matches the
+        # user ID (newer format), or if the sender name is the user's
+        out = column('out')
+        mask = out.notna() & out.astype(bool)
+        if user_id:
+            mask |= (from_id == f"user{user_id}") | (from_id == str(user_id))
+        if first_name:
+            mask |= sender == first_name
+        
+        outgoing = df.loc[mask]
+        
+        # Dates as naive UTC: date_unixtime when present, otherwise the ISO
+        # date, which older exports write in the exporter's local time
+        dates = pd.to_datetime(pd.to_numeric(column('date_unixtime')[mask], errors='coerce'), unit='s')
+        iso_dates = column('date')[mask]
+        local_only = dates.isna() & iso_dates.notna()
+        if local_only.any():
+            dates[local_only] = pd.to_datetime(iso_dates[local_only].map(_local_timestamp), unit='s')
+        
+        # json_normalize returns meta fields as object columns; chat IDs are
+        # integers in the export, so restore the integer dtype
+        chat_ids = outgoing['chat_id']
+        if chat_ids.notna().all():
+            chat_ids = chat_ids.astype('int64')
+        
+        # Handle text field which can be string or list; only outgoing rows
+        # need flattening, so filter first
+        texts = column('text')[mask].fillna('').map(_coerce_text)
+        
+        return pd.DataFrame({
+            'chat_id': chat_ids,
+            'chat_name': outgoing['chat_name'].fillna('Chat_' + chat_ids.astype(str)),
+            'chat_type': outgoing['chat_type'].fillna('unknown'),
+            'message_id': column('id')[mask],
+            'date': dates,
+            'text': texts,
+            'from_id': from_id[mask],
+            'from': sender[mask],
+            'reply_to_message_id': column('reply_to_message_id')[mask],
+        }).reset_index(drop=True)
+    
     def find_messages_by_keywords(self, keywords: List[str], 
                                  case_sensitive: bool = False,
                                  whole_words: bool = True) -> pd.DataFrame:
@@ -143,40 +352,31 @@ class TelegramJSONAnalyzer:
         if not keywords:
             return pd.DataFrame()
         
-        # Combine keywords into a single regex pattern
-        if whole_words:
-            # Add word boundaries for whole word matching
-            keyword_patterns = [rf'\b{kw}\b' for kw in keywords]
-        else:
-            keyword_patterns = keywords
-        
-        combined_pattern = '|'.join(keyword_patterns)
+        # Combine keywords into a single regex alternation
+        pattern, labeled_pattern = _compile_keyword_set(tuple(keywords), case_sensitive, whole_words)
         
-        flags = 0 if case_sensitive else re.IGNORECASE
-        pattern = re.compile(combined_pattern, flags)
+        # Named group kN identifies keyword N in a single scan of each match
+        group_keywords = {f'k{i}': kw for i, kw in enumerate(keywords)}
         
         # Find matching messages
-        matches = []
-        for idx, row in self.messages_df.iterrows():
-            text = str(row['text'])
-            if pattern.search(text):
-                # Find which keywords matched
-                matched_keywords = []
-                for kw in keywords:
-                    if whole_words:
-                        kw_pattern = rf'\b{kw}\b'
-                    else:
-                        kw_pattern = kw
-                    
-                    kw_flags = 0 if case_sensitive else re.IGNORECASE
-                    if re.search(kw_pattern, text, kw_flags):
-                        matched_keywords.append(kw)
-                
-                match_data = row.copy()
-                match_data['matched_keywords'] = ', '.join(matched_keywords)
-                matches.append(match_data)
-        
-        matches_df = pd.DataFrame(matches)
+        texts = self.messages_df['text'].astype(str)
+        candidates = _literal_prefilter(texts, keywords, case_sensitive)
+        if candidates is None:
+            mask = texts.str.contains(pattern, na=False)
+        else:
+            # Confirm word boundaries and case with the regex on candidates only
+            is_candidate = candidates.to_numpy()
+            mask = is_candidate.copy()
+            mask[is_candidate] = texts[candidates].str.contains(pattern, na=False).to_numpy(dtype=bool)
+        matches_df = self.messages_df.loc[mask].copy()
+        
+        # Find which keywords matched, scanning only the matching texts
+        matched_keywords = []
+        for text in texts[mask].to_numpy():
+            found = {m.lastgroup for m in labeled_pattern.finditer(text)}
+            matched_keywords.append(', '.join(kw for group, kw in group_keywords.items() if group in found))
+        matches_df['matched_keywords'] = matched_keywords
+        
         print(f"Found {len(matches_df)} messages matching keywords: {', '.join(keywords)}")
         
         return matches_df
@@ -205,8 +405,45 @@ class TelegramJSONAnalyzer:
             'text', 'matched_keywords'
         ]
         
-        preview_df = matches_df[preview_columns].copy()
-        preview_df.to_csv(output_path, index=False, encoding='utf-8')
+        # Column selection is already a new frame, so write it directly
+        matches_df[preview_columns].to_csv(output_path, index=False, encoding='utf-8')
+        
+        print(f"Preview saved to: {output_path}")
+        return str(output_path)
+    
+    def save_preview_parquet(self, matches_df: pd.DataFrame, output_file: str = None) -> str:
+        """
+        Save matching messages to a Parquet file for preview.
+        
+        The file also keeps chat_id, so it can be passed straight to
+        telegram_deleter.py. Falls back to CSV if pyarrow is not installed.
+        
+        Args:
+            matches_df: DataFrame with matching messages
+            output_file: Output file path (optional)
+        
+        Returns:
+            Path to the saved file
+        """
+        if pyarrow is None:
+            print("⚠️  pyarrow not installed, saving preview as CSV instead")
+            if output_file is not None:
+                output_file = str(Path(output_file).with_suffix('.csv'))
+            return self.save_preview_csv(matches_df, output_file)
+        
+        if output_file is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            output_file = f"output/keyword_matches_{timestamp}.parquet"
+        
+        output_path = Path(output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        preview_columns = [
+            'chat_id', 'chat_name', 'chat_type', 'message_id', 'date', 
+            'text', 'matched_keywords'
+        ]
+        
+        matches_df[preview_columns].to_parquet(output_path, index=False, compression='zstd')
         
         print(f"Preview saved to: {output_path}")
         return str(output_path)
@@ -239,12 +476,7 @@ class TelegramJSONAnalyzer:
         }
         
         # Count matches per keyword
-        keyword_counts = {}
-        for keywords_str in matches_df['matched_keywords']:
-            for keyword in keywords_str.split(', '):
-                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
-        
-        summary['keyword_counts'] = keyword_counts
+        summary['keyword_counts'] = matches_df['matched_keywords'].str.get_dummies(sep=', ').sum().astype(int).to_dict()
         
         return summary
     
@@ -284,12 +516,13 @@ def main():
     parser.add_argument('--keywords', nargs='+', required=True, help='Keywords to search for')
     parser.add_argument('--case-sensitive', action='store_true', help='Case sensitive search')
     parser.add_argument('--whole-words', action='store_true', default=True, help='Match whole words only')
-    parser.add_argument('--output', help='Output CSV file path')
+    parser.add_argument('--output', help='Output file path (.csv, or .parquet to write Parquet)')
+    parser.add_argument('--stream', action='store_true', help='Stream large exports with ijson to save memory')
     
     args = parser.parse_args()
     
     # Initialize analyzer
-    analyzer = TelegramJSONAnalyzer(args.export_file)
+    analyzer = TelegramJSONAnalyzer(args.export_file, stream=args.stream)
     
     # Load and process data
     analyzer.load_export()
@@ -307,7 +540,10 @@ def main():
     
     # Save preview
     if not matches.empty:
-        analyzer.save_preview_csv(matches, args.output)
+        if args.output and args.output.endswith('.parquet'):
+            analyzer.save_preview_parquet(matches, args.output)
+        else:
+            analyzer.save_preview_csv(matches, args.output)
     else:
         print("No matching messages found.")
 
@@ -3,6 +3,7 @@ Telegram Message Deleter using Telethon
 Provides safe bulk deletion of Telegram messages with dry-run mode and batch processing.
 """
 import asyncio
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
@@ -11,8 +12,10 @@ from telethon.errors import FloodWaitError, ChatAdminRequiredError, MessageDelet
 from telethon.tl.types import Message
 import time
 import logging
+from itertools import islice
 from pathlib import Path
 from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
 import colorama
 from colorama import Fore, Style
 
@@ -37,6 +40,12 @@ class TelegramDeleter:
         self.session_name = session_name
         self.client = None
         
+        # Resolved chats, and the dialog list fetched at most once per session
+        self._entity_cache: Dict[str, Any] = {}
+        self._dialogs: Optional[List[Any]] = None
+        self._dialogs_by_id: Dict[int, Any] = {}
+        self._dialogs_lock: Optional[asyncio.Lock] = None
+        
         # Setup logging
         self.setup_logging()
         
@@ -46,7 +55,8 @@ class TelegramDeleter:
             'successfully_deleted': 0,
             'failed': 0,
             'skipped': 0,
-            'errors': []
+            # Error report columns, appended in parallel
+            'errors': {'chat_name': [], 'message_id': [], 'error': []}
         }
     
     def setup_logging(self):
@@ -61,7 +71,7 @@ class TelegramDeleter:
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler(log_file),
+                logging.FileHandler(log_file, delay=True),
                 logging.StreamHandler()
             ]
         )
@@ -92,6 +102,26 @@ class TelegramDeleter:
         if self.client:
             await self.client.disconnect()
     
+    async def get_dialogs(self) -> List[Any]:
+        """
+        Get the dialog list, fetching it from Telegram only once per session.
+        
+        Returns:
+            List of dialogs
+        """
+        if self._dialogs_lock is None:
+            self._dialogs_lock = asyncio.Lock()
+        
+        async with self._dialogs_lock:
+            if self._dialogs is None:
+                self._dialogs = await self.client.get_dialogs()
+                for dialog in self._dialogs:
+                    # Index by both the marked ID and the raw ID used in exports
+                    self._dialogs_by_id[dialog.id] = dialog.entity
+                    self._dialogs_by_id[dialog.entity.id] = dialog.entity
+        
+        return self._dialogs
+    
     async def find_chat_by_name_or_id(self, chat_identifier: str) -> Optional[Any]:
         """
         Find a chat by name or ID.
@@ -102,27 +132,42 @@ class TelegramDeleter:
         Returns:
             Chat entity or None if not found
         """
+        if chat_identifier in self._entity_cache:
+            return self._entity_cache[chat_identifier]
+        
         try:
-            # Try to get chat directly by ID if it's numeric
-            if chat_identifier.isdigit() or (chat_identifier.startswith('-') and chat_identifier[1:].isdigit()):
-                chat_id = int(chat_identifier)
-                return await self.client.get_entity(chat_id)
-            
-            # Try to find by username
-            if chat_identifier.startswith('@'):
-                return await self.client.get_entity(chat_identifier)
-            
-            # Search for chats by name
-            dialogs = await self.client.get_dialogs()
-            for dialog in dialogs:
-                if dialog.name and chat_identifier.lower() in dialog.name.lower():
-                    return dialog.entity
-            
-            return None
-            
+            chat_entity = await self._resolve_chat(chat_identifier)
         except Exception as e:
             self.logger.error(f"Error finding chat '{chat_identifier}': {e}")
             return None
+        
+        if chat_entity is not None:
+            self._entity_cache[chat_identifier] = chat_entity
+        return chat_entity
+    
+    async def _resolve_chat(self, chat_identifier: str) -> Optional[Any]:
+        """Look up a chat entity by ID, username or name."""
+        # Try to get chat directly by ID if it's numeric
+        if chat_identifier.isdigit() or (chat_identifier.startswith('-') and chat_identifier[1:].isdigit()):
+            chat_id = int(chat_identifier)
+            try:
+                return await self.client.get_entity(chat_id)
+            except ValueError:
+                # Exports store channel IDs without Telethon's -100 prefix,
+                # so fall back to the raw IDs of the dialog list
+                await self.get_dialogs()
+                return self._dialogs_by_id.get(chat_id)
+        
+        # Try to find by username
+        if chat_identifier.startswith('@'):
+            return await self.client.get_entity(chat_identifier)
+        
+        # Search for chats by name
+        for dialog in await self.get_dialogs():
+            if dialog.name and chat_identifier.lower() in dialog.name.lower():
+                return dialog.entity
+        
+        return None
     
     async def get_message_from_chat(self, chat_entity: Any, message_id: int) -> Optional[Message]:
         """
@@ -194,6 +239,90 @@ class TelegramDeleter:
             self.logger.error(error_msg)
             return False, error_msg
     
+    async def delete_messages_bulk(self, chat_entity: Any, message_ids: List[int],
+                                   revoke: bool = True, dry_run: bool = True) -> Tuple[bool, str]:
+        """
+        Delete several messages from one chat with bulk requests.
+        
+        Unlike delete_message, the messages are not fetched first to check
+        ownership, so callers must only pass IDs of their own messages (see
+        filter_own_messages).
+        
+        Args:
+            chat_entity: Chat entity
+            message_ids: Message IDs (Telethon sends them 100 per request)
+            revoke: Whether to delete for everyone (True) or just for self (False)
+            dry_run: If True, only simulate deletion
+        
+        Returns:
+            Tuple of (success, message)
+        """
+        if dry_run:
+            return True, f"DRY RUN: Would delete {len(message_ids)} messages"
+        
+        while True:
+            try:
+                await self.client.delete_messages(chat_entity, message_ids, revoke=revoke)
+                return True, f"Deleted {len(message_ids)} messages"
+                
+            except FloodWaitError as e:
+                # Unlike single deletions, retry so the whole chunk isn't lost
+                wait_time = e.seconds
+                self.logger.warning(f"Rate limited. Waiting {wait_time} seconds...")
+                await asyncio.sleep(wait_time)
+                
+            except ChatAdminRequiredError:
+                return False, "Admin rights required"
+                
+            except MessageDeleteForbiddenError:
+                return False, "Message deletion forbidden"
+                
+            except Exception as e:
+                error_msg = f"Unexpected error: {e}"
+                self.logger.error(error_msg)
+                return False, error_msg
+    
+    async def filter_own_messages(self, chat_entity: Any,
+                                  message_ids: List[int]) -> Tuple[List[int], List[Tuple[int, str]]]:
+        """
+        Split message IDs into our own messages and ones that must not be deleted.
+        
+        Fetches all the messages with one request, instead of one request per
+        message as delete_message does.
+        
+        Args:
+            chat_entity: Chat entity
+            message_ids: Message IDs (Telethon fetches them 100 per request)
+        
+        Returns:
+            Tuple of (IDs of our own messages, list of (message_id, reason) for the rest)
+        """
+        while True:
+            try:
+                messages = await self.client.get_messages(chat_entity, ids=message_ids)
+                break
+                
+            except FloodWaitError as e:
+                wait_time = e.seconds
+                self.logger.warning(f"Rate limited. Waiting {wait_time} seconds...")
+                await asyncio.sleep(wait_time)
+                
+            except Exception as e:
+                error_msg = f"Could not fetch messages: {e}"
+                self.logger.error(error_msg)
+                return [], [(message_id, error_msg) for message_id in message_ids]
+        
+        own_ids = []
+        rejected = []
+        for message_id, message in zip(message_ids, messages):
+            if not message:
+                rejected.append((message_id, "Message not found"))
+            elif not message.out:
+                rejected.append((message_id, "Message is not from you"))
+            else:
+                own_ids.append(message_id)
+        return own_ids, rejected
+    
     async def delete_messages_batch(self, messages_df: pd.DataFrame, 
                                   dry_run: bool = True, 
                                   batch_size: int = 100,
@@ -217,58 +346,104 @@ class TelegramDeleter:
         self.logger.info(f"Starting {'dry run' if dry_run else 'deletion'} of {len(messages_df)} messages")
         self.logger.info(f"Batch size: {batch_size}, Delay: {delay_between_batches}s")
         
-        # Group messages by chat for efficiency
-        chat_groups = messages_df.groupby(['chat_id', 'chat_name'])
+        # Sort by chat once and walk each chat's contiguous run of rows,
+        # instead of materializing a sub-DataFrame per group
+        ordered = messages_df.sort_values('chat_id', kind='stable')
+        chat_ids = ordered['chat_id'].to_numpy()
+        chat_names = ordered['chat_name'].to_numpy()
+        all_message_ids = ordered['message_id'].to_numpy(dtype=np.int64)
+        # Plain ints, so counts derived from the bounds stay JSON-friendly in stats
+        bounds = np.r_[0, np.flatnonzero(chat_ids[1:] != chat_ids[:-1]) + 1, len(chat_ids)].tolist()
         
-        total_chats = len(chat_groups)
-        processed_chats = 0
+        total_chats = len(bounds) - 1
         
-        for (chat_id, chat_name), chat_messages in chat_groups:
-            processed_chats += 1
-            self.logger.info(f"Processing chat {processed_chats}/{total_chats}: {chat_name} ({len(chat_messages)} messages)")
-            
-            # Find chat entity
-            chat_entity = await self.find_chat_by_name_or_id(str(chat_id))
-            if not chat_entity:
-                self.logger.error(f"Could not find chat: {chat_name} (ID: {chat_id})")
-                self.stats['failed'] += len(chat_messages)
-                continue
-            
-            # Process messages in batches
-            message_ids = chat_messages['message_id'].tolist()
+        def resolve_chat(index: int) -> asyncio.Task:
+            return asyncio.create_task(self.find_chat_by_name_or_id(str(chat_ids[bounds[index]])))
+        
+        next_entity = resolve_chat(0)
+        
+        # Warnings and errors are printed above the bar instead of splitting it;
+        # the current chat is shown in the bar's postfix
+        with logging_redirect_tqdm():
+            pbar = tqdm(total=len(messages_df), desc='Deleting', unit='msg')
             
-            for i in range(0, len(message_ids), batch_size):
-                batch = message_ids[i:i + batch_size]
-                batch_num = i // batch_size + 1
-                total_batches = (len(message_ids) + batch_size - 1) // batch_size
-                
-                self.logger.info(f"  Processing batch {batch_num}/{total_batches} ({len(batch)} messages)")
-                
-                # Process each message in the batch
-                for msg_id in tqdm(batch, desc=f"Batch {batch_num}"):
-                    success, message = await self.delete_message(
-                        chat_entity, msg_id, revoke=True, dry_run=dry_run
-                    )
+            try:
+                for processed_chats, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]), start=1):
+                    chat_id = chat_ids[start]
+                    chat_name = chat_names[start]
+                    self.logger.debug(f"Processing chat {processed_chats}/{total_chats}: {chat_name} ({end - start} messages)")
                     
-                    self.stats['total_processed'] += 1
+                    # Find chat entity, and start looking up the next chat while
+                    # this one's messages are deleted
+                    chat_entity = await next_entity
+                    if processed_chats < total_chats:
+                        next_entity = resolve_chat(processed_chats)
+                    if not chat_entity:
+                        self.logger.error(f"Could not find chat: {chat_name} (ID: {chat_id})")
+                        self.stats['failed'] += end - start
+                        pbar.update(end - start)
+                        continue
                     
-                    if success:
+                    # Process messages in batches
+                    message_ids = all_message_ids[start:end].tolist()
+                    
+                    for i in range(0, len(message_ids), batch_size):
+                        batch = message_ids[i:i + batch_size]
+                        
+                        failures = []
+                        
+                        # Exports can mislabel other people's messages as ours (a
+                        # namesake, or a guessed user ID), so check ownership with
+                        # one fetch per batch before deleting for everyone
                         if dry_run:
-                            self.stats['skipped'] += 1
+                            own_ids = batch
                         else:
-                            self.stats['successfully_deleted'] += 1
-                    else:
-                        self.stats['failed'] += 1
-                        self.stats['errors'].append({
-                            'chat_name': chat_name,
-                            'message_id': msg_id,
-                            'error': message
-                        })
-                
-                # Delay between batches (except for the last batch)
-                if i + batch_size < len(message_ids) and delay_between_batches > 0:
-                    self.logger.info(f"  Waiting {delay_between_batches}s before next batch...")
-                    await asyncio.sleep(delay_between_batches)
+                            own_ids, failures = await self.filter_own_messages(chat_entity, batch)
+                        
+                        if own_ids:
+                            success, message = await self.delete_messages_bulk(
+                                chat_entity, own_ids, revoke=True, dry_run=dry_run
+                            )
+                            if success:
+                                if dry_run:
+                                    self.stats['skipped'] += len(own_ids)
+                                else:
+                                    self.stats['successfully_deleted'] += len(own_ids)
+                            elif len(own_ids) > 1:
+                                # One bad message fails the whole request, so retry
+                                # the batch one ID at a time to delete the rest
+                                self.logger.warning(f"Bulk delete failed in {chat_name} ({message}), retrying individually")
+                                for message_id in own_ids:
+                                    success, message = await self.delete_messages_bulk(
+                                        chat_entity, [message_id], revoke=True, dry_run=dry_run
+                                    )
+                                    if success:
+                                        self.stats['successfully_deleted'] += 1
+                                    else:
+                                        failures.append((message_id, message))
+                            else:
+                                failures.append((own_ids[0], message))
+                        
+                        self.stats['total_processed'] += len(batch)
+                        
+                        if failures:
+                            self.stats['failed'] += len(failures)
+                            errors = self.stats['errors']
+                            errors['chat_name'].extend([chat_name] * len(failures))
+                            for message_id, message in failures:
+                                errors['message_id'].append(message_id)
+                                errors['error'].append(message)
+                        
+                        pbar.update(len(batch))
+                        pbar.set_postfix(chat=chat_name, failed=self.stats['failed'])
+                        
+                        # Delay between batches (except for the last batch)
+                        if i + batch_size < len(message_ids) and delay_between_batches > 0:
+                            await asyncio.sleep(delay_between_batches)
+            finally:
+                pbar.close()
+                if not next_entity.done():
+                    next_entity.cancel()
         
         return self.stats
     
@@ -282,17 +457,20 @@ class TelegramDeleter:
         print(f"Failed: {Fore.RED}{self.stats['failed']}{Style.RESET_ALL}")
         print(f"Skipped (dry run): {Fore.YELLOW}{self.stats['skipped']}{Style.RESET_ALL}")
         
-        if self.stats['errors']:
+        errors = self.stats['errors']
+        error_count = len(errors['message_id'])
+        if error_count:
             print(f"\n{Fore.RED}Errors encountered:{Style.RESET_ALL}")
-            for error in self.stats['errors'][:10]:  # Show first 10 errors
-                print(f"  - {error['chat_name']} (msg {error['message_id']}): {error['error']}")
+            # Show first 10 errors
+            for chat_name, message_id, error in islice(zip(errors['chat_name'], errors['message_id'], errors['error']), 10):
+                print(f"  - {chat_name} (msg {message_id}): {error}")
             
-            if len(self.stats['errors']) > 10:
-                print(f"  ... and {len(self.stats['errors']) - 10} more errors")
+            if error_count > 10:
+                print(f"  ... and {error_count - 10} more errors")
     
     def save_error_report(self, output_file: str = None) -> str:
         """Save detailed error report to CSV."""
-        if not self.stats['errors']:
+        if not self.stats['errors']['message_id']:
             return ""
         
         if output_file is None:
@@ -314,7 +492,7 @@ async def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Delete Telegram messages using Telethon')
-    parser.add_argument('messages_csv', help='CSV file with messages to delete')
+    parser.add_argument('messages_csv', help='CSV or Parquet file with messages to delete')
     parser.add_argument('--dry-run', action='store_true', default=True, help='Dry run mode (default)')
     parser.add_argument('--execute', action='store_true', help='Actually delete messages (overrides dry-run)')
     parser.add_argument('--batch-size', type=int, default=100, help='Messages per batch')
@@ -339,7 +517,10 @@ async def main():
             return
     
     # Load messages to delete
-    messages_df = pd.read_csv(args.messages_csv)
+    if args.messages_csv.endswith('.parquet'):
+        messages_df = pd.read_parquet(args.messages_csv)
+    else:
+        messages_df = pd.read_csv(args.messages_csv)
     print(f"Loaded {len(messages_df)} messages to {'simulate deletion' if dry_run else 'delete'}")
     
     # Initialize deleter
@@ -368,7 +549,7 @@ async def main():
         deleter.print_statistics()
         
         # Save error report if there were errors
-        if stats['errors']:
+        if stats['errors']['message_id']:
             deleter.save_error_report()
     
     finally:
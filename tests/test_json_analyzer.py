@@ -0,0 +1,71 @@
+"""
+Tests for the Telegram JSON export analyzer.
+"""
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from json_analyzer import TelegramJSONAnalyzer
+
+
+def make_analyzer(tmp_path, messages, **personal_information):
+    """Write a one-chat export with the given messages and extract them."""
+    export = {
+        'personal_information': {'user_id': 42, 'first_name': 'Me', **personal_information},
+        'chats': {'list': [{'id': 1001, 'name': 'Test chat', 'type': 'personal_chat', 'messages': messages}]},
+    }
+    export_file = tmp_path / 'result.json'
+    export_file.write_text(json.dumps(export), encoding='utf-8')
+    
+    analyzer = TelegramJSONAnalyzer(str(export_file))
+    analyzer.load_export()
+    analyzer.extract_outgoing_messages()
+    return analyzer
+
+
+def outgoing_message(message_id, text, **fields):
+    return {'id': message_id, 'type': 'message', 'date': '2024-01-15T10:00:00',
+            'date_unixtime': '1705312800', 'from': 'Me', 'from_id': 'user42',
+            'text': text, **fields}
+
+
+@pytest.mark.parametrize('keyword, text', [
+    ('istanbul', 'Flying to İstanbul tomorrow'),
+    ('secret', 'the ſecret plan'),
+    ('ΟΔΟΣ', 'ΟΔΟΣΗΜΑΝΣΗ ΟΔΟΣ'),
+])
+def test_case_insensitive_search_matches_non_ascii_case_forms(tmp_path, keyword, text):
+    # str.lower() disagrees with re.IGNORECASE on these, so the literal
+    # prefilter must not drop them before the regex runs
+    analyzer = make_analyzer(tmp_path, [
+        outgoing_message(1, text),
+        outgoing_message(2, 'nothing to see here'),
+    ])
+    
+    matches = analyzer.find_messages_by_keywords([keyword], whole_words=False)
+    
+    assert matches['message_id'].tolist() == [1]
+
+
+def test_unix_dates_are_naive_utc(tmp_path):
+    analyzer = make_analyzer(tmp_path, [outgoing_message(1, 'hello')])
+    
+    assert analyzer.messages_df['date'].tolist() == [pd.Timestamp('2024-01-15 10:00:00')]
+
+
+def test_iso_only_dates_are_converted_from_local_time_to_utc(tmp_path, monkeypatch):
+    # Exports without date_unixtime carry local wall-clock time; POSIX
+    # 'EST+05' is UTC-5 and needs no tz database
+    monkeypatch.setenv('TZ', 'EST+05')
+    time.tzset()
+    try:
+        message = outgoing_message(1, 'hello')
+        del message['date_unixtime']
+        analyzer = make_analyzer(tmp_path, [message])
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    
+    assert analyzer.messages_df['date'].tolist() == [pd.Timestamp('2024-01-15 15:00:00')]